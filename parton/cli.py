@@ -4,21 +4,19 @@
 import argparse
 from fnmatch import fnmatch
 from . import io
-import tarfile
 import logging
-logging.basicConfig(level=logging.INFO)
 
 
 
 def main(argv=None):
+    logging.basicConfig(level=logging.INFO)
     parser = argparse.ArgumentParser(prog='parton',
                                      description="Command line interface to download parton distribution functions.")
     subparsers = parser.add_subparsers(title='subcommands')
-    defaultdir = io.data_dir()
-    parser.add_argument("--listdir", default=defaultdir,
-                               help="Directory where the index of PDF sets is stored (default: {}).".format(defaultdir))
-    parser.add_argument("--pdfdir", default=defaultdir,
-                               help="Directory where the PDF sets are stored (default: {}).".format(defaultdir))
+    parser.add_argument("--listdir",
+                               help="Directory where the index of PDF sets is stored (default: parton's user data directory).")
+    parser.add_argument("--pdfdir",
+                               help="Directory where the PDF sets are stored (default: parton's user data directory).")
 
     parser_update = subparsers.add_parser('update',
                                           description="Command line script to update the list of PDF sets.",
@@ -38,11 +36,34 @@ def main(argv=None):
     parser_install.add_argument('-y', action='store_true')
     parser_install.set_defaults(func=install)
 
+    parser_resample = subparsers.add_parser('resample',
+                                            description="Command line script to resample a PDF member onto a reduced knot grid and save it as a new PDF set.",
+                                            help="Resample a PDF member onto a reduced knot grid.")
+    parser_resample.add_argument('name')
+    parser_resample.add_argument('newname')
+    parser_resample.add_argument('--member', type=int, default=0)
+    parser_resample.add_argument('--rtol', type=float, default=1e-3,
+                                 help="Relative interpolation tolerance (default: 1e-3).")
+    parser_resample.add_argument('--atol', type=float, default=1e-8,
+                                 help="Absolute interpolation tolerance (default: 1e-8).")
+    parser_resample.add_argument('--merge', action='store_true',
+                                 help="Merge all subgrids into a single grid.")
+    parser_resample.add_argument('--outdir',
+                                 help="Directory where the new PDF set is stored (default: PDFDIR).")
+    parser_resample.add_argument('--overwrite', action='store_true',
+                                 help="Overwrite an existing PDF set NEWNAME.")
+    parser_resample.set_defaults(func=resamplepdf)
+
     args = parser.parse_args(argv)
-    try:
-        args.func(args)
-    except AttributeError:
+    if not hasattr(args, 'func'):
         parser.print_help()
+        return
+    # the default directory is only determined (and created) when needed
+    if args.listdir is None or args.pdfdir is None:
+        defaultdir = io.data_dir()
+        args.listdir = args.listdir or defaultdir
+        args.pdfdir = args.pdfdir or defaultdir
+    args.func(args)
 
 
 def update(args):
@@ -63,6 +84,7 @@ def install(args):
     print('\n'.join(to_install))
     yes = args.y or input("Proceed? (y/n): ").lower()
     if yes:
+        import tarfile
         for pdf in to_install:
             try:
                 io.download_pdfset(pdf, args.pdfdir)
@@ -77,3 +99,21 @@ def listpdf(args):
         pdfs = io.list_available(args.listdir)
     for pdf in pdfs:
         print(pdf)
+
+
+def resamplepdf(args):
+    from . import pdf, resample
+    try:
+        p = pdf.PDF(args.name, member=args.member, pdfdir=args.pdfdir)
+        report = resample.resample(p, args.newname, pdfdir=args.outdir,
+                                   rtol=args.rtol, atol=args.atol, merge=args.merge,
+                                   overwrite=args.overwrite)
+    except ValueError as e:
+        logging.error(str(e))
+        return
+    print("Knots: {} -> {}".format(report['knots_before'], report['knots_after']))
+    print("File size: {} -> {} bytes".format(report['filesize_before'], report['filesize_after']))
+    print("Maximum absolute error: {:.3g}".format(report['max_abs_error']))
+    print("Maximum relative error: {:.3g}".format(report['max_rel_error']))
+    print("Speedup of loading: {:.2f}".format(report['load_speedup']))
+    print("Speedup of evaluation: {:.2f}".format(report['eval_speedup']))
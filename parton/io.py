@@ -1,13 +1,10 @@
-import urllib.request
 import os
 import logging
-import appdirs
-import tarfile
-logging.basicConfig(level=logging.INFO)
 
 
 def data_dir():
     """Return the default data directory."""
+    import appdirs
     datadir = appdirs.user_data_dir('parton')
     if not os.path.exists(datadir):
         os.makedirs(datadir)
@@ -19,6 +16,7 @@ URL_PDF = 'https://lhapdfsets.web.cern.ch/current/{}.tar.gz'
 
 
 def download_file(url, filename):
+    import urllib.request
     logging.info("Downloading {} to {}...".format(url, filename))
     urllib.request.urlretrieve(url, filename=filename)
     logging.info("Done.")
@@ -36,6 +34,7 @@ def download_index(listdir):
 
 
 def download_pdfset(name, pdfdir):
+    import tarfile
     filename = os.path.join(pdfdir, '{}.tar.gz'.format(name))
     download_file(URL_PDF.format(name), filename)
     logging.info("Extracting {} ...".format(filename))
@@ -1,87 +1,222 @@
 from . import io
 import os
 import re
-import yaml
+import collections
+import concurrent.futures
+import functools
 from io import StringIO
 import numpy as np
-import scipy.interpolate
-import scipy.integrate
 
 
-class MyRectBivariateSpline(scipy.interpolate.RectBivariateSpline):
-    """Patch of the `scipy.interpolate.RectBivariateSpline` class extending
-    it by the `bounds_error` and `fill_value` options that work
-    like for `interp2d`."""
+@functools.lru_cache(maxsize=None)
+def spline_class():
+    """Return the `MyRectBivariateSpline` class.
 
-    def __init__(self, x, y, z, *args, bounds_error=False, fill_value=None,
-                 **kwargs):
-        """Initialize the `MyRectBivariateSpline instance`.
+    The class is only created on first use, to avoid importing
+    `scipy.interpolate` when the package is imported."""
+    import scipy.interpolate
 
-        The additional parameters `bounds_error` and `fill_value` work
+    class MyRectBivariateSpline(scipy.interpolate.RectBivariateSpline):
+        """Patch of the `scipy.interpolate.RectBivariateSpline` class extending
+        it by the `bounds_error` and `fill_value` options that work
         like for `interp2d`."""
-        super().__init__(x, y, z, *args, **kwargs)
-        self.bounds_error = bounds_error
-        self.fill_value = fill_value
-        self.x_min, self.x_max = np.amin(x), np.amax(x)
-        self.y_min, self.y_max = np.amin(y), np.amax(y)
-
-        # a small margin is added to the min and max values to avoid numerical issues
-        self.x_min = self.x_min - abs(self.x_min)/1e10
-        self.x_max = self.x_max + abs(self.x_max)/1e10
-        self.y_min = self.y_min - abs(self.y_min)/1e10
-        self.y_max = self.y_max + abs(self.y_max)/1e10
-
-    def __call__(self, x, y, *args, **kwargs):
-        """Call the `MyRectBivariateSpline` instance.
-
-        The shape of the inputs and outputs is the same as for
-        `scipy.interpolate.RectBivariateSpline`."""
-        # the following code is taken from scipy/interpolate/interpolate.py
-        if not kwargs.get("grid", True) and x.shape != y.shape:
-            x, y = np.broadcast_arrays(x, y)
-        if self.bounds_error or self.fill_value is not None:
-            out_of_bounds_x = (x < self.x_min) | (x > self.x_max)
-            out_of_bounds_y = (y < self.y_min) | (y > self.y_max)
-
-            any_out_of_bounds_x = np.any(out_of_bounds_x)
-            any_out_of_bounds_y = np.any(out_of_bounds_y)
-
-        if self.bounds_error and (any_out_of_bounds_x or any_out_of_bounds_y):
-            raise ValueError("Values out of range; x must be in %r, y in %r"
-                             % ((self.x_min, self.x_max),
-                                (self.y_min, self.y_max)))
-
-        z = super().__call__(x, y, *args, **kwargs)
-
-        if self.fill_value is not None:
-            if kwargs.get("grid", True):
-                if any_out_of_bounds_x:
-                    z[out_of_bounds_x, :] = self.fill_value
-                if any_out_of_bounds_y:
-                    z[:, out_of_bounds_y] = self.fill_value
-            else:
-                if any_out_of_bounds_x or any_out_of_bounds_y:
-                    z[out_of_bounds_x | out_of_bounds_y] = self.fill_value
-        return z
+
+        def __init__(self, x, y, z, *args, bounds_error=False, fill_value=None,
+                     **kwargs):
+            """Initialize the `MyRectBivariateSpline instance`.
+
+            The additional parameters `bounds_error` and `fill_value` work
+            like for `interp2d`."""
+            super().__init__(x, y, z, *args, **kwargs)
+            self.bounds_error = bounds_error
+            self.fill_value = fill_value
+            self.x_min, self.x_max = np.amin(x), np.amax(x)
+            self.y_min, self.y_max = np.amin(y), np.amax(y)
+
+            # a small margin is added to the min and max values to avoid numerical issues
+            self.x_min = self.x_min - abs(self.x_min)/1e10
+            self.x_max = self.x_max + abs(self.x_max)/1e10
+            self.y_min = self.y_min - abs(self.y_min)/1e10
+            self.y_max = self.y_max + abs(self.y_max)/1e10
+
+        def __call__(self, x, y, *args, **kwargs):
+            """Call the `MyRectBivariateSpline` instance.
+
+            The shape of the inputs and outputs is the same as for
+            `scipy.interpolate.RectBivariateSpline`."""
+            # the following code is taken from scipy/interpolate/interpolate.py
+            if not kwargs.get("grid", True) and x.shape != y.shape:
+                x, y = np.broadcast_arrays(x, y)
+            if self.bounds_error or self.fill_value is not None:
+                out_of_bounds_x = (x < self.x_min) | (x > self.x_max)
+                out_of_bounds_y = (y < self.y_min) | (y > self.y_max)
+
+                any_out_of_bounds_x = np.any(out_of_bounds_x)
+                any_out_of_bounds_y = np.any(out_of_bounds_y)
+
+            if self.bounds_error and (any_out_of_bounds_x or any_out_of_bounds_y):
+                raise ValueError("Values out of range; x must be in %r, y in %r"
+                                 % ((self.x_min, self.x_max),
+                                    (self.y_min, self.y_max)))
+
+            z = super().__call__(x, y, *args, **kwargs)
+
+            if self.fill_value is not None:
+                if kwargs.get("grid", True):
+                    if any_out_of_bounds_x:
+                        z[out_of_bounds_x, :] = self.fill_value
+                    if any_out_of_bounds_y:
+                        z[:, out_of_bounds_y] = self.fill_value
+                else:
+                    if any_out_of_bounds_x or any_out_of_bounds_y:
+                        z[out_of_bounds_x | out_of_bounds_y] = self.fill_value
+            return z
+
+    # make instances picklable through the module-level `__getattr__`
+    MyRectBivariateSpline.__qualname__ = 'MyRectBivariateSpline'
+    return MyRectBivariateSpline
+
+
+def __getattr__(name):
+    # `MyRectBivariateSpline` is created lazily by `spline_class`
+    if name == 'MyRectBivariateSpline':
+        return spline_class()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def spline_matrix(knots, points):
+    """Return the matrix that maps values given on the 1D grid `knots` to
+    the values of their cubic interpolating spline at `points`.
+
+    The spline is the same (not-a-knot) interpolant that
+    `MyRectBivariateSpline` uses along each axis, so the 2D interpolant
+    on a grid of values `z` is `A_x @ z @ A_y.T`. Rows for points outside
+    the range of `knots` are filled with NaN."""
+    import scipy.interpolate
+    knots = np.asarray(knots)
+    points = np.asarray(points)
+    spline = scipy.interpolate.make_interp_spline(knots, np.eye(len(knots)), k=3)
+    matrix = spline(points)
+    k_min, k_max = np.amin(knots), np.amax(knots)
+    # same margin as in MyRectBivariateSpline
+    k_min = k_min - abs(k_min)/1e10
+    k_max = k_max + abs(k_max)/1e10
+    matrix[(points < k_min) | (points > k_max)] = np.nan
+    return matrix
+
+
+def spline_basis(t, points, derivative=False):
+    """Return the indices and values of the four nonzero cubic B-spline
+    basis functions with knots `t` at each of the `points`, as a tuple of
+    two arrays with shape `(len(points), 4)`.
+
+    If `derivative` is true, the first derivatives of the same basis
+    functions are returned as a third array, so that a spline and its
+    derivative are obtained from a single lookup of the knot spans.
+    Values for points outside the range of the knots (with the same
+    margin as in `MyRectBivariateSpline`) are NaN."""
+    t = np.asarray(t)
+    points = np.asarray(points, dtype=float)
+    t_min, t_max = t[3], t[-4]
+    p = np.clip(points, t_min, t_max)
+    # knot span t[l] <= p < t[l + 1], the last one closed on the right
+    l = np.clip(np.searchsorted(t, p, side='right') - 1, 3, len(t) - 5)
+    left = [p - t[l + 1 - j] for j in range(4)]
+    right = [t[l + j] - p for j in range(4)]
+    # Cox-de Boor recursion for the nonzero basis functions of degree 0 to 3
+    basis = [np.ones_like(p)]
+    for j in range(1, 4):
+        quadratic = basis
+        saved = 0
+        basis = []
+        for r in range(j):
+            temp = quadratic[r] / (right[r + 1] + left[j - r])
+            basis.append(saved + right[r + 1] * temp)
+            saved = left[j - r] * temp
+        basis.append(saved)
+    indices = l[:, None] + np.arange(-3, 1)
+    values = np.stack(basis, axis=1)
+    t_min = t_min - abs(t_min)/1e10
+    t_max = t_max + abs(t_max)/1e10
+    outside = (points < t_min) | (points > t_max)
+    values[outside] = np.nan
+    if not derivative:
+        return indices, values
+    # derivative of the cubic basis from the quadratic one on the same span
+    w = [3 * quadratic[r] / (t[l + 1 + r] - t[l - 2 + r]) for r in range(3)]
+    derivatives = np.stack([-w[0], w[0] - w[1], w[1] - w[2], w[2]], axis=1)
+    derivatives[outside] = np.nan
+    return indices, values, derivatives
+
+
+def basis_matrix(indices, values, n):
+    """Return the dense matrix with `n` columns corresponding to the
+    nonzero basis functions `indices` and `values` returned by
+    `spline_basis`."""
+    matrix = np.zeros((len(indices), n))
+    np.put_along_axis(matrix, indices, values, axis=1)
+    # points outside the knots give rows of NaN
+    matrix[np.isnan(values[:, 0])] = np.nan
+    return matrix
+
+
+def logx_quadrature(logx, x_min, x_max, n=4):
+    """Return nodes and weights of a quadrature rule in log(x) on the
+    interval from `x_min` to `x_max`.
+
+    The interval is split at the knots `logx` of the interpolation grid
+    and an `n`-point Gauss-Legendre rule is used on each piece, on which
+    the interpolant is a polynomial. Returns the tuple `(x, w)` such that
+    the integral of g(x) over log(x) is approximated by `np.sum(w * g(x))`."""
+    a, b = np.log(x_min), np.log(x_max)
+    logx = np.asarray(logx)
+    edges = np.unique(np.concatenate([[a, b], logx[(logx > a) & (logx < b)]]))
+    t, w = np.polynomial.legendre.leggauss(n)
+    half = np.diff(edges)[:, None] / 2
+    mid = (edges[1:] + edges[:-1])[:, None] / 2
+    return np.exp((mid + half * t).ravel()), (half * w).ravel()
+
+
+def sum_rules(moment, flavors):
+    """Return a dictionary with the momentum sum and the valence sums,
+    given a function `moment(flavor, N)` returning Mellin moments and the
+    list of available `flavors`.
+
+    The valence sums are only included for the quark flavors that are
+    present together with their antiquark."""
+    flavors = [f for f in flavors if f != 0 or 21 not in flavors]
+    res = {'momentum': sum(moment(f, 2) for f in flavors)}
+    names = {1: 'dv', 2: 'uv', 3: 'sv', 4: 'cv', 5: 'bv', 6: 'tv'}
+    for q, name in names.items():
+        if q in flavors and -q in flavors:
+            res[name] = moment(q, 1) - moment(-q, 1)
+    return res
 
 
 class PDFSet(object):
     """Class representing a PDF set."""
 
-    def __init__(self, name, pdfdir=None):
+    def __init__(self, name, pdfdir=None, info=None):
         """Initialize the PDF set with name `name`.
 
         Optionally, the directory where the PDF files are located can be
-        specified as `pdfdir`."""
+        specified as `pdfdir`. If the dictionary `info` is given, it is
+        used as metadata instead of reading the YAML file, e.g. to create
+        a new set with `write_metadata`."""
         self.name = name
         self.pdfdir = pdfdir or io.data_dir()
-        self.read_metadata()
+        if info is None:
+            self.read_metadata()
+        else:
+            self.info = info
+        self._grids = {}
 
     def read_metadata(self):
         """Read the PDF set's metadata fromm the YAML file.
 
         This method is called on instantiation and the result is stored in
         the `self.info` attribute."""
+        import yaml
         filename = os.path.join(self.pdfdir, self.name, '{}.info'.format(self.name))
         if not os.path.exists(filename):
             raise ValueError("File {} not found".format(filename))
@@ -89,6 +224,201 @@ class PDFSet(object):
             info = yaml.safe_load(f)
         self.info = info
 
+    def write_metadata(self):
+        """Write the PDF set's metadata in the `self.info` attribute to the
+        YAML file, creating the set's directory if necessary."""
+        import yaml
+        dirname = os.path.join(self.pdfdir, self.name)
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+        filename = os.path.join(dirname, '{}.info'.format(self.name))
+        with open(filename, 'w') as f:
+            yaml.safe_dump(self.info, f, default_flow_style=False, sort_keys=False)
+
+    def members(self):
+        """Return the list of indices of all members of the set."""
+        return list(range(self.info['NumMembers']))
+
+    def grids(self, members=None):
+        """Return a list of `PDFGridStack` instances, one per subgrid,
+        containing the grids of the members `members` (defaults to all
+        members).
+
+        Returns a cached instance after the first call. If the members are
+        contained in an already cached stack (e.g. the replicas in the stack
+        of all members), the stack is taken from it instead of loading the
+        members again; for a contiguous range of members, it is a view that
+        does not take additional memory."""
+        if members is None:
+            members = self.members()
+        members = tuple(members)
+        if members not in self._grids:
+            cached = next((cached for cached in self._grids
+                           if set(members) <= set(cached)), None)
+            if cached is not None:
+                position = {member: i for i, member in enumerate(cached)}
+                index = [position[member] for member in members]
+                if index == list(range(index[0], index[0] + len(index))):
+                    index = slice(index[0], index[0] + len(index))
+                self._grids[members] = [stack.subset(index)
+                                        for stack in self._grids[cached]]
+            else:
+                pdfgrids = []
+                for member in members:
+                    meta, grids = PDFMember(self, member).load()
+                    pdfgrids.append([PDFGrid.from_block(grid) for grid in grids])
+                # cached subsets of the new members are taken from it when needed
+                self._grids = {cached: stacks for cached, stacks in self._grids.items()
+                               if not set(cached) <= set(members)}
+                self._grids[members] = [PDFGridStack.from_grids(subgrids)
+                                        for subgrids in zip(*pdfgrids)]
+        return self._grids[members]
+
+    def xfxQ2(self, flavor, x, Q2, members=None, grid=True):
+        """Return x*f(x) for all members `members` (defaults to all members)
+        by specifying flavor, `x`, and factorization scale squared `Q2` in
+        GeV^2.
+
+        The result has the shape of the output of `PDF.xfxQ2` with an
+        additional leading axis running over the members. All members are
+        evaluated at once without instantiating `PDF` objects."""
+        stacks = self.grids(members)
+        n_members = stacks[0].xfgrids.shape[0]
+        if grid == True:
+            res = np.full((n_members, np.size(x), np.size(Q2)), np.nan)
+        else:
+            flavor, x, Q2 = map(np.asarray, (flavor, x, Q2))
+            shape = np.broadcast_shapes(flavor.shape, x.shape, Q2.shape)
+            res = np.full((n_members,) + shape, np.nan)
+        for stack in stacks:
+            _res = stack.xfxQ2(flavor, x, Q2, grid=grid)
+            res[np.isnan(res)] = _res[np.isnan(res)]
+            if not np.any(np.isnan(res)):
+                break
+        return res
+
+    def moment(self, flavor, N, Q2, members=None, x_min=None, x_max=1, n=4):
+        """Return the Mellin moment `N` of the PDF for flavor `flavor`, i.e.
+        the integral of x^(N-1) f(x) from `x_min` to `x_max`, for all
+        members `members` (defaults to all members).
+
+        `flavor` and `Q2` can be arrays and the result has the shape
+        `(n_members,) + np.shape(flavor) + np.shape(Q2)`. See `PDF.moment`
+        for the meaning of the remaining arguments."""
+        stacks = self.grids(members)
+        if x_min is None:
+            x_min = np.min([np.min(stack.x) for stack in stacks])
+        logx = np.concatenate([stack.logx for stack in stacks])
+        x, w = logx_quadrature(logx, x_min, x_max, n=n)
+        w = w * x**(N - 1)
+        res = [np.tensordot(self.xfxQ2(f, x, Q2, members=members), w, axes=(1, 0))
+               for f in np.ravel(flavor)]
+        res = np.stack(res, axis=1)
+        return res.reshape(res.shape[:1] + np.shape(flavor) + np.shape(Q2))
+
+    def replicas(self):
+        """Return the list of indices of the Monte Carlo replicas of the
+        set, i.e. all members except the central member 0 for sets with
+        error type 'replicas', and all members otherwise."""
+        if self.info.get('ErrorType') == 'replicas':
+            return self.members()[1:]
+        return self.members()
+
+    def reweight(self, predictions, data, cov, members=None):
+        """Return a `Reweighting` instance for the Bayesian reweighting of
+        the Monte Carlo replicas `members` (defaults to `replicas()`) with
+        respect to new data.
+
+        Parameters:
+
+        - `predictions`: array with shape `(n_members, n_data)` containing
+          the theory predictions of the replicas, or a function that
+          returns this array when called with a function `xfxQ2(flavor, x,
+          Q2, grid=True)` that evaluates all replicas at once (see the
+          `xfxQ2` method)
+        - `data`: array of the `n_data` measured values
+        - `cov`: covariance matrix of the data or, if one-dimensional,
+          array of their uncorrelated uncertainties"""
+        if members is None:
+            members = self.replicas()
+        if callable(predictions):
+            def xfxQ2(flavor, x, Q2, grid=True):
+                return self.xfxQ2(flavor, x, Q2, members=members, grid=grid)
+            predictions = predictions(xfxQ2)
+        return Reweighting(self, members, predictions, data, cov)
+
+    def sum_rules(self, Q2, members=None, **kwargs):
+        """Return a dictionary with the momentum sum and the valence sums
+        at factorization scale squared `Q2` in GeV^2 for all members
+        `members` (defaults to all members).
+
+        Additional keyword arguments are passed to `moment`."""
+        flavors = self.grids(members)[0].flavors
+        return sum_rules(lambda f, N: self.moment(f, N, Q2, members=members, **kwargs),
+                         list(flavors))
+
+
+class Reweighting(object):
+    """Class representing the Bayesian reweighting of the Monte Carlo
+    replicas of a PDF set with respect to new data.
+
+    The weights are w_k ∝ chi2_k^((n-1)/2) exp(-chi2_k/2), where chi2_k is
+    the chi-squared of replica k and n the number of data points. They are
+    normalized such that they sum to the number of replicas.
+
+    Note that it is usually more convenient to instantiate the class using
+    the `PDFSet.reweight` method."""
+
+    def __init__(self, pdfset, members, predictions, data, cov):
+        """Initialize the class by specifying a `PDFSet` instance, the list
+        of replica indices `members`, the array of `predictions` with shape
+        `(n_members, n_data)`, the `data` and their covariance matrix `cov`
+        (or, if one-dimensional, their uncorrelated uncertainties)."""
+        self.pdfset = pdfset
+        self.members = list(members)
+        predictions = np.atleast_2d(predictions)
+        data = np.atleast_1d(data)
+        cov = np.asarray(cov)
+        if cov.ndim < 2:
+            cov = np.diag(np.broadcast_to(cov, data.shape)**2)
+        if predictions.shape != (len(self.members), len(data)):
+            raise ValueError("Predictions must have shape {}".format((len(self.members), len(data))))
+        # chi2 of all replicas at once via the Cholesky factor of the covariance
+        L = np.linalg.cholesky(cov)
+        r = np.linalg.solve(L, (predictions - data).T)
+        self.chi2 = np.sum(r**2, axis=0)
+        n = len(data)
+        with np.errstate(divide='ignore'):
+            logw = (n - 1) / 2 * np.log(self.chi2) - self.chi2 / 2
+        w = np.exp(logw - np.max(logw))
+        self.weights = len(w) * w / np.sum(w)
+
+    @property
+    def n_eff(self):
+        """Effective number of replicas after reweighting."""
+        w = self.weights[self.weights > 0]
+        n = len(self.weights)
+        return np.exp(np.sum(w * np.log(n / w)) / n)
+
+    def mean(self, values):
+        """Return the weighted mean of the array `values` whose leading axis
+        runs over the replicas."""
+        return np.tensordot(self.weights, values, axes=(0, 0)) / len(self.weights)
+
+    def std(self, values):
+        """Return the weighted standard deviation of the array `values` whose
+        leading axis runs over the replicas."""
+        values = np.asarray(values)
+        mean = self.mean(values)
+        return np.sqrt(self.mean((values - mean)**2))
+
+    def xfxQ2(self, flavor, x, Q2, grid=True):
+        """Return the tuple `(central, uncertainty)` of the weighted mean and
+        standard deviation of x*f(x) over the replicas by specifying flavor,
+        `x`, and factorization scale squared `Q2` in GeV^2."""
+        values = self.pdfset.xfxQ2(flavor, x, Q2, members=self.members, grid=grid)
+        return self.mean(values), self.std(values)
+
 
 class PDFMember(object):
     """Class representing a specific member of a PDF set."""
@@ -113,6 +443,7 @@ class PDFMember(object):
         Returns the tuple `(meta, grids)`, where `meta` is a dictionary
         with the contents of the YAML metadata block and `grids` is
         a list of strings with the raw contents of the subgrid blocks."""
+        import yaml
         filename = self.filename()
         if not os.path.exists(filename):
             raise ValueError("Data file {} not found".format(filename))
@@ -126,6 +457,19 @@ class PDFMember(object):
             grids = blocks[1:]  # only omit first (YAML) block
         return meta, grids
 
+    def write(self, meta, pdfgrids):
+        """Write the PDF grid file.
+
+        `meta` is a dictionary with the contents of the YAML metadata block
+        and `pdfgrids` a list of `PDFGrid` instances."""
+        import yaml
+        contents = yaml.safe_dump(meta, default_flow_style=False, sort_keys=False)
+        for pdfgrid in pdfgrids:
+            contents += '---\n' + pdfgrid.to_block()
+        contents += '---\n'
+        with open(self.filename(), 'w') as f:
+            f.write(contents)
+
 
 class PDFGrid(object):
     """Class representing an individual subgrid of a PDF in 'lhagrid1' format.
@@ -155,6 +499,16 @@ class PDFGrid(object):
         xfgrid = np.loadtxt(StringIO('\n'.join(lines[3:])))
         return cls(x, Q, xfgrid, flavors)
 
+    def to_block(self):
+        """Return the raw contents of a 'lhagrid1' subgrid block as a string,
+        the inverse of `from_block`."""
+        f = StringIO()
+        np.savetxt(f, self.x[None, :], fmt='%.8e')
+        np.savetxt(f, self.Q[None, :], fmt='%.8e')
+        np.savetxt(f, np.atleast_1d(self.flavors)[None, :], fmt='%d')
+        np.savetxt(f, self.xfgrid, fmt='%.8e')
+        return f.getvalue()
+
     def flav_index(self, flavor):
         """Return the position in the list of flavors corresponding to flavor
         `flavor`. 0 is interpreted as 21 (gluon)."""
@@ -175,23 +529,185 @@ class PDFGrid(object):
             m = len(self.x)
             n = len(self.Q)
             i = self.flav_index(flavor)
-            self._interpolators[flavor] = MyRectBivariateSpline(self.logx, self.logQ2, self.xfgrid[:, i].reshape(m, n), bounds_error=False, fill_value=np.nan)
+            self._interpolators[flavor] = spline_class()(self.logx, self.logQ2, self.xfgrid[:, i].reshape(m, n), bounds_error=False, fill_value=np.nan)
         return self._interpolators[flavor]
 
-    def xfxQ2(self, flavor, x, Q2, grid=True):
+    def xfxQ2(self, flavor, x, Q2, grid=True, dlogx=0, dlogQ2=0):
         """Return x*f(x) for flavor `flavor`, momentum fraction `x` and
-        squared factorization scale in units of GeV^2, `Q2`."""
+        squared factorization scale in units of GeV^2, `Q2`.
+
+        If `dlogx` or `dlogQ2` are nonzero, the corresponding partial
+        derivative of the interpolant with respect to log(x) and log(Q2)
+        is returned instead."""
         flavors = np.unique(flavor)
         if grid and len(flavors) > 1:
             raise RuntimeError("No logical way to make a grid for multiple flavors")
         elif grid:
-            return self.interpolator(flavors[0])(np.log(x), np.log(Q2), grid=grid)
-        # this could be further optimized to not evaluate every point for every flavor
+            return self.interpolator(flavors[0])(np.log(x), np.log(Q2), grid=grid,
+                                                 dx=dlogx, dy=dlogQ2)
         flavor, x, Q2 = np.broadcast_arrays(flavor, x, Q2)
-        out = self.interpolator(flavors[0])(np.log(x), np.log(Q2), grid=False)
-        for f in flavors[1:]:
+        logx, logQ2 = np.log(x), np.log(Q2)
+        if len(flavors) == 1:
+            return self.interpolator(flavors[0])(logx, logQ2, grid=False,
+                                                 dx=dlogx, dy=dlogQ2)
+        # evaluate every flavor only on its own points
+        out = np.empty(x.shape)
+        for f in flavors:
+            mask = flavor == f
+            out[mask] = self.interpolator(f)(logx[mask], logQ2[mask], grid=False,
+                                             dx=dlogx, dy=dlogQ2)
+        return out
+
+    def coefficients(self, flavor):
+        """Return the tuple `(tx, tQ, c)` of the knots in log(x) and log(Q2)
+        and the array of coefficients with shape `(len(x), len(Q))` of the
+        B-spline used by the interpolator for flavor `flavor`."""
+        tx, tQ, c = self.interpolator(flavor).tck
+        return tx, tQ, c.reshape(len(tx) - 4, len(tQ) - 4)
+
+    def derivatives(self, flavor, logx, logQ2, grid=True):
+        """Return the tuple `(xf, dxf_dlogx, dxf_dlogQ2)` of x*f(x) and its
+        partial derivatives with respect to log(x) and log(Q2) for flavor
+        `flavor`, given the logarithms `logx` and `logQ2` of the momentum
+        fraction and of the squared factorization scale in GeV^2.
+
+        All three are computed from the same B-spline basis functions
+        returned by `spline_basis`, so the knot spans are only looked up
+        once."""
+        flavors = np.unique(flavor)
+        if grid and len(flavors) > 1:
+            raise RuntimeError("No logical way to make a grid for multiple flavors")
+        elif grid:
+            tx, tQ, c = self.coefficients(flavors[0])
+            ix, bx, dbx = spline_basis(tx, np.ravel(logx), derivative=True)
+            iQ, bQ, dbQ = spline_basis(tQ, np.ravel(logQ2), derivative=True)
+            Ax, dAx = (basis_matrix(ix, b, c.shape[0]) for b in (bx, dbx))
+            AQ, dAQ = (basis_matrix(iQ, b, c.shape[1]) for b in (bQ, dbQ))
+            cAQ = c @ AQ.T
+            return Ax @ cAQ, dAx @ cAQ, Ax @ (c @ dAQ.T)
+        flavor, logx, logQ2 = np.broadcast_arrays(flavor, logx, logQ2)
+        outs = tuple(np.empty(logx.shape) for _ in range(3))
+        for f in flavors:
             mask = flavor == f
-            out[mask] = self.interpolator(f)(np.log(x), np.log(Q2), grid=False)[mask]
+            tx, tQ, c = self.coefficients(f)
+            ix, bx, dbx = spline_basis(tx, logx[mask], derivative=True)
+            iQ, bQ, dbQ = spline_basis(tQ, logQ2[mask], derivative=True)
+            res = dres_dlogx = dres_dlogQ2 = 0
+            for a in range(4):
+                # contract the Q2 direction first, shared by all three
+                cx = [c[ix[:, a], iQ[:, b]] for b in range(4)]
+                g = sum(bQ[:, b] * cx[b] for b in range(4))
+                h = sum(dbQ[:, b] * cx[b] for b in range(4))
+                res = res + bx[:, a] * g
+                dres_dlogx = dres_dlogx + dbx[:, a] * g
+                dres_dlogQ2 = dres_dlogQ2 + bx[:, a] * h
+            for out, _out in zip(outs, (res, dres_dlogx, dres_dlogQ2)):
+                out[mask] = _out
+        return outs
+
+
+class PDFGridStack(object):
+    """Class representing the same subgrid of several members of a PDF set,
+    sharing the same `x`, `Q`, and flavors.
+
+    The members are interpolated simultaneously using the spline matrices
+    returned by `spline_matrix` or the B-spline coefficients returned by
+    `coefficients`, which reproduce the interpolation of `PDFGrid`."""
+
+    def __init__(self, x, Q, xfgrids, flavors):
+        """Initialize the stack from arrays of `x`, `Q` spanning a grid,
+        an array `xfgrids` of xfx values on the grid with a leading axis
+        running over the members, and a list of flavours.
+
+        Note that it is usually more convenient to initialize the class
+        using the `from_grids` class method."""
+        self.x = x
+        self.Q = Q
+        self.logx = np.log(self.x)
+        self.logQ2 = np.log(self.Q**2)
+        self.xfgrids = xfgrids
+        self.flavors = flavors
+        self._coefficients = {}
+
+    @classmethod
+    def from_grids(cls, pdfgrids):
+        """Class method. Return an instance of the class given a list of
+        `PDFGrid` instances with identical knots and flavors."""
+        first = pdfgrids[0]
+        for pdfgrid in pdfgrids[1:]:
+            if (not np.array_equal(pdfgrid.x, first.x)
+                    or not np.array_equal(pdfgrid.Q, first.Q)
+                    or not np.array_equal(pdfgrid.flavors, first.flavors)):
+                raise ValueError("Grids of different members do not match")
+        xfgrids = np.stack([pdfgrid.xfgrid for pdfgrid in pdfgrids])
+        return cls(first.x, first.Q, xfgrids, first.flavors)
+
+    flav_index = PDFGrid.flav_index
+
+    def subset(self, index):
+        """Return a `PDFGridStack` instance with the members selected by
+        `index`, a slice or a list of positions along the leading axis,
+        sharing the coefficients computed so far."""
+        stack = PDFGridStack(self.x, self.Q, self.xfgrids[index], self.flavors)
+        stack._coefficients = {flavor: (tx, tQ, c[index])
+                               for flavor, (tx, tQ, c) in self._coefficients.items()}
+        return stack
+
+    def values(self, flavor):
+        """Return the array of xfx values for flavor `flavor` with shape
+        `(n_members, len(x), len(Q))`."""
+        i = self.flav_index(flavor)
+        return self.xfgrids[:, :, i].reshape(-1, len(self.x), len(self.Q))
+
+    def coefficients(self, flavor):
+        """Return the tuple `(tx, tQ, c)` of the knots in log(x) and log(Q2)
+        and the array of coefficients with shape `(n_members, len(x), len(Q))`
+        of the tensor-product B-spline interpolating the values for flavor
+        `flavor`.
+
+        Returns a cached instance after the first call."""
+        if flavor not in self._coefficients:
+            import scipy.interpolate
+            spline_x = scipy.interpolate.make_interp_spline(
+                self.logx, self.values(flavor), k=3, axis=1)
+            # the coefficients have the interpolation axis first: (x, member, Q)
+            spline_Q = scipy.interpolate.make_interp_spline(
+                self.logQ2, spline_x.c, k=3, axis=2)
+            c = spline_Q.c.transpose(2, 1, 0)  # (Q, x, member) -> (member, x, Q)
+            self._coefficients[flavor] = spline_x.t, spline_Q.t, c
+        return self._coefficients[flavor]
+
+    def xfxQ2(self, flavor, x, Q2, grid=True):
+        """Return x*f(x) for all members for flavor `flavor`, momentum
+        fraction `x` and squared factorization scale in units of GeV^2,
+        `Q2`.
+
+        The result has an additional leading axis running over the members."""
+        flavors = np.unique(flavor)
+        if grid and len(flavors) > 1:
+            raise RuntimeError("No logical way to make a grid for multiple flavors")
+        elif grid:
+            Ax = spline_matrix(self.logx, np.log(np.ravel(x)))
+            AQ = spline_matrix(self.logQ2, np.log(np.ravel(Q2)))
+            return Ax @ (self.values(flavors[0]) @ AQ.T)
+        flavor, x, Q2 = np.broadcast_arrays(flavor, x, Q2)
+        out = np.full((self.xfgrids.shape[0],) + x.shape, np.nan)
+        if x.size == 0:
+            return out
+        # like points outside the grid, non-finite points give NaN
+        finite = np.isfinite(x) & np.isfinite(Q2)
+        for f in flavors:
+            mask = (flavor == f) & finite
+            tx, tQ, c = self.coefficients(f)
+            ix, bx = spline_basis(tx, np.log(x[mask]))
+            iQ, bQ = spline_basis(tQ, np.log(Q2[mask]))
+            # sum over the 4x4 nonzero basis functions at each point, so that
+            # the temporaries only have shape (n_members, n_points)
+            res = 0
+            for a in range(4):
+                for b in range(4):
+                    res = res + bx[:, a] * bQ[:, b] * c[:, ix[:, a], iQ[:, b]]
+            out[:, mask] = res
         return out
 
 
@@ -206,7 +722,7 @@ class PDF(object):
         self.member = member
         self.pdfset = PDFSet(name, pdfdir=pdfdir)
         self.pdfmember = PDFMember(self.pdfset, member=member)
-        meta, grids = self.pdfmember.load()
+        self.meta, grids = self.pdfmember.load()
         self.pdfgrids = [PDFGrid.from_block(grid) for grid in grids]
 
     def xfxQ(self, flavor, x, Q, grid=True):
@@ -219,18 +735,172 @@ class PDF(object):
         squared `Q2` in GeV^2."""
         if grid == True:
             res = np.full((np.size(x), np.size(Q2)), np.nan)
+            for i, pdfgrid in enumerate(self.pdfgrids):
+                _res = pdfgrid.xfxQ2(flavor, x, Q2, grid=grid)
+                res[np.isnan(res)] = _res[np.isnan(res)]
+                if not np.any(np.isnan(res)):
+                    break
         else:
-            flavor, x, Q2 = map(np.asarray, (flavor, x, Q2))
-            res = np.full(np.broadcast_shapes(flavor.shape, x.shape, Q2.shape), np.nan)
-        for i, pdfgrid in enumerate(self.pdfgrids):
-            _res = pdfgrid.xfxQ2(flavor, x, Q2, grid=grid)
-            res[np.isnan(res)] = _res[np.isnan(res)]
-            if not np.any(np.isnan(res)):
+            flavor, x, Q2 = np.broadcast_arrays(flavor, x, Q2)
+            res = np.full(x.shape, np.nan)
+            missing = np.ones(x.shape, dtype=bool)
+            # later subgrids are only evaluated on the points still missing
+            for pdfgrid in self.pdfgrids:
+                res[missing] = pdfgrid.xfxQ2(flavor[missing], x[missing],
+                                             Q2[missing], grid=False)
+                missing = np.isnan(res)
+                if not np.any(missing):
+                    break
+        if np.size(res) == 1:
+            res = res.item()
+        return res
+
+    def iter_xfxQ2(self, chunks, processes=1):
+        """Return a generator yielding x*f(x) for each tuple
+        `(flavor, x, Q2)` of broadcastable arrays in the iterable `chunks`,
+        in the same order.
+
+        Only a bounded number of chunks is held in memory at a time, so
+        `chunks` can be a generator reading from a large file. If
+        `processes` is larger than 1, the chunks are evaluated in a pool of
+        that many worker processes; `None` uses all available cores."""
+        if processes == 1:
+            for flavor, x, Q2 in chunks:
+                yield np.asarray(self.xfxQ2(flavor, x, Q2, grid=False))
+            return
+        if processes is None:
+            processes = os.cpu_count()
+        initargs = (self.name, self.member, self.pdfset.pdfdir)
+        with concurrent.futures.ProcessPoolExecutor(
+                processes, initializer=_init_worker, initargs=initargs) as executor:
+            pending = collections.deque()
+            for chunk in chunks:
+                chunk = tuple(np.asarray(a) for a in chunk)
+                pending.append(executor.submit(_worker_xfxQ2, *chunk))
+                if len(pending) >= 2 * processes:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def xfxQ2_stream(self, flavor, x, Q2, out=None, chunksize=2**16, processes=1):
+        """Return x*f(x) for 1D arrays (or scalars) `flavor`, `x`, and `Q2`
+        that are processed in chunks of `chunksize` points.
+
+        The inputs can be memory-mapped arrays (`numpy.memmap`), in which
+        case only one chunk per worker is read into memory at a time. The
+        result is written into `out`, which can be an array (e.g. a
+        `numpy.memmap`) or a filename for a new `.npy` file that is created
+        as memory-mapped array; if `out` is None, a new array is allocated.
+        `processes` is passed to `iter_xfxQ2`. Returns `out`."""
+        flavor, x, Q2 = np.broadcast_arrays(flavor, x, Q2)
+        if x.ndim != 1:
+            raise ValueError("Inputs must be one-dimensional")
+        n = len(x)
+        if out is None:
+            out = np.empty(n)
+        elif isinstance(out, str):
+            out = np.lib.format.open_memmap(out, mode='w+', shape=(n,))
+        elif out.shape != (n,):
+            raise ValueError("Output array must have shape {}".format((n,)))
+        starts = range(0, n, chunksize)
+        chunks = ((flavor[i:i + chunksize], x[i:i + chunksize], Q2[i:i + chunksize])
+                  for i in starts)
+        for i, res in zip(starts, self.iter_xfxQ2(chunks, processes=processes)):
+            out[i:i + chunksize] = res
+        return out
+
+    def xfxQ2_derivatives(self, flavor, x, Q2, grid=True):
+        """Return x*f(x) together with its partial derivatives with respect
+        to log(x) and log(Q2), by specifying flavor, `x`, and factorization
+        scale squared `Q2` in GeV^2.
+
+        Returns a tuple `(xf, dxf_dlogx, dxf_dlogQ2)` of arrays with the same
+        shape as the output of `xfxQ2`. The derivatives are exact derivatives
+        of the spline interpolant, evaluated on the same subgrid that is used
+        for the value of x*f(x)."""
+        if grid == True:
+            logx, logQ2 = np.log(np.ravel(x)), np.log(np.ravel(Q2))
+            shape = (len(logx), len(logQ2))
+        else:
+            flavor, x, Q2 = np.broadcast_arrays(flavor, x, Q2)
+            logx, logQ2 = np.log(x), np.log(Q2)
+            shape = x.shape
+        res = np.full(shape, np.nan)
+        dres_dlogx = np.full(shape, np.nan)
+        dres_dlogQ2 = np.full(shape, np.nan)
+        outs = (res, dres_dlogx, dres_dlogQ2)
+        missing = np.ones(shape, dtype=bool)
+        # later subgrids are only evaluated on the points still missing
+        for pdfgrid in self.pdfgrids:
+            if grid == True:
+                rows, cols = np.any(missing, axis=1), np.any(missing, axis=0)
+                block = np.ix_(rows, cols)
+                new = missing[block]
+                _outs = pdfgrid.derivatives(flavor, logx[rows], logQ2[cols], grid=True)
+                for out, _out in zip(outs, _outs):
+                    out_block = out[block]
+                    out_block[new] = _out[new]
+                    out[block] = out_block
+            else:
+                _outs = pdfgrid.derivatives(flavor[missing], logx[missing],
+                                            logQ2[missing], grid=False)
+                for out, _out in zip(outs, _outs):
+                    out[missing] = _out
+            missing = np.isnan(res)
+            if not np.any(missing):
                 break
         if np.size(res) == 1:
-            res = float(res)
+            return res.item(), dres_dlogx.item(), dres_dlogQ2.item()
+        return res, dres_dlogx, dres_dlogQ2
+
+
+    def moment(self, flavor, N, Q2, x_min=None, x_max=1, n=4):
+        """Return the Mellin moment `N` of the PDF for flavor `flavor`, i.e.
+        the integral of x^(N-1) f(x) from `x_min` (defaults to the smallest
+        x value of the grid) to `x_max`, at factorization scale squared `Q2`
+        in GeV^2.
+
+        `flavor` and `Q2` can be arrays and the result has the shape
+        `np.shape(flavor) + np.shape(Q2)`. The interpolant is integrated
+        in log(x) with an `n`-point Gauss-Legendre rule between each pair
+        of neighbouring knots."""
+        if x_min is None:
+            x_min = np.min([np.min(pdfgrid.x) for pdfgrid in self.pdfgrids])
+        logx = np.concatenate([pdfgrid.logx for pdfgrid in self.pdfgrids])
+        x, w = logx_quadrature(logx, x_min, x_max, n=n)
+        w = w * x**(N - 1)
+        # evaluating on a grid requires sorted values of Q2
+        _Q2, inverse = np.unique(Q2, return_inverse=True)
+        res = [(w @ np.reshape(self.xfxQ2(f, x, _Q2), (len(x), -1)))[inverse]
+               for f in np.ravel(flavor)]
+        res = np.array(res).reshape(np.shape(flavor) + np.shape(Q2))
+        if np.size(res) == 1:
+            res = res.item()
         return res
 
+    def sum_rules(self, Q2, **kwargs):
+        """Return a dictionary with the momentum sum (`'momentum'`) and the
+        valence sums (`'uv'`, `'dv'`, ...) at factorization scale squared
+        `Q2` in GeV^2.
+
+        Additional keyword arguments are passed to `moment`."""
+        return sum_rules(lambda f, N: self.moment(f, N, Q2, **kwargs),
+                         list(self.pdfgrids[0].flavors))
+
+
+_worker_pdf = None
+
+
+def _init_worker(name, member, pdfdir):
+    """Load the PDF in a worker process of `PDF.iter_xfxQ2`."""
+    global _worker_pdf
+    _worker_pdf = PDF(name, member=member, pdfdir=pdfdir)
+
+
+def _worker_xfxQ2(flavor, x, Q2):
+    """Evaluate a chunk in a worker process of `PDF.iter_xfxQ2`."""
+    return np.asarray(_worker_pdf.xfxQ2(flavor, x, Q2, grid=False))
+
 
 class PLumi(object):
     """Class representation a parton luminosity."""
@@ -243,18 +913,41 @@ class PLumi(object):
         self.N = 1000
         self.x_min = np.min([np.min(v.x) for v in pdf.pdfgrids])
         self._interpolators = {}
+        self._tables = {}
+        self._pdf_interpolators = {}
+
+    def table(self, p):
+        """Return the tuple `(x, xf)` of x*f(x) for flavor `p` tabulated
+        on the logarithmic x grid used for the luminosities.
+
+        Returns a cached instance after the first call."""
+        if p not in self._tables:
+            _x = np.logspace(np.log10(self.x_min), 0, num=self.N)
+            self._tables[p] = _x, self.pdf.xfxQ2(p, _x, self.Q2).ravel()
+        return self._tables[p]
 
     def _interpolator(self, p1, p2):
-        def f1(x):
-            return self.pdf.xfxQ2(p1, x, self.Q2).ravel() / x
-        def f2(x):
-            return self.pdf.xfxQ2(p2, x, self.Q2).ravel() / x
-        _x = np.logspace(np.log10(self.x_min), 0, num=self.N)
-        _f1 = f1(_x)
-        _f2 = f2(_x)
+        import scipy.interpolate
+        _x, _xf1 = self.table(p1)
+        _x, _xf2 = self.table(p2)
+        _f1 = _xf1 / _x
+        _f2 = _xf2 / _x
         _y = np.convolve(_f1, _f2, 'full')[-self.N:] / self.N * (-np.log(self.x_min))
         return scipy.interpolate.interp1d(np.log(_x), _y, kind='cubic', bounds_error=False, fill_value=np.nan)
 
+    def pdf_interpolator(self, p):
+        """Return an instance of the `scipy.interpolate.interp1d` interpolator
+        of x*f(x) for flavor `p` as function of log(x), based on the table
+        returned by `table`.
+
+        Returns a cached instance after the first call."""
+        if p not in self._pdf_interpolators:
+            import scipy.interpolate
+            _x, _xf = self.table(p)
+            self._pdf_interpolators[p] = scipy.interpolate.interp1d(
+                np.log(_x), _xf, kind='cubic', bounds_error=False, fill_value=np.nan)
+        return self._pdf_interpolators[p]
+
     def interpolator(self, p1, p2):
         """Return an instance of the `scipy.interpolate.interp1d` interpolator
         for flavors `p1` and `p2`.
@@ -270,6 +963,81 @@ class PLumi(object):
         squared."""
         return self.interpolator(p1, p2)(np.log(t))
 
+    def sigma(self, channels, s, tau_min=None, tau_max=1, rapidity=False,
+              method='gauss', n=64, seed=None):
+        """Return the hadronic cross section obtained by convolving
+        partonic cross sections with the parton luminosities, together with
+        an estimate of its numerical uncertainty, as tuple `(sigma, error)`.
+
+        Parameters:
+
+        - `channels`: list of tuples `(p1, p2, sigma_hat)` where `p1` and `p2`
+          are flavors and `sigma_hat` is a vectorized function of the partonic
+          center-of-mass energy squared `shat` in GeV^2 (or of `shat` and the
+          rapidity `y` of the partonic system if `rapidity` is true)
+        - `s`: hadronic center-of-mass energy squared in GeV^2
+        - `tau_min`, `tau_max`: integration range in tau = shat/s, which must
+          lie between the smallest x value of the PDF grid (the default of
+          `tau_min`) and 1
+        - `rapidity`: if true, integrate over the full kinematically allowed
+          rapidity range as well, using the tabulated PDFs instead of the
+          luminosities
+        - `method`: either `'gauss'` (Gauss-Legendre quadrature with `n`
+          nodes in log(tau) and rapidity, with the error estimated from the
+          difference to the rule with `n // 2` nodes) or `'mc'` (plain Monte
+          Carlo integration with `n` points, using the random seed `seed`,
+          with the error estimated from the sample variance); `n` must be
+          at least 2
+
+        All channels are evaluated on the same nodes and the luminosities
+        are taken from the cached interpolators."""
+        if method not in ('gauss', 'mc'):
+            raise ValueError("Unknown integration method {}".format(method))
+        if n < 2:
+            raise ValueError("The number of integration points n must be at least 2")
+        if tau_min is None:
+            tau_min = self.x_min
+        if not self.x_min <= tau_min < tau_max <= 1:
+            raise ValueError("The integration range must satisfy "
+                             "{} <= tau_min < tau_max <= 1".format(self.x_min))
+        a, b = np.log(tau_min), np.log(tau_max)
+        dim = 2 if rapidity else 1
+
+        def integrand(u):
+            # u has shape (dim, n_points) with entries in [-1, 1]
+            logtau = (a + b) / 2 + (b - a) / 2 * u[0]
+            tau = np.exp(logtau)
+            res = 0
+            if not rapidity:
+                for p1, p2, sigma_hat in channels:
+                    res = res + tau * self.L(p1, p2, tau) * sigma_hat(tau * s)
+                return (b - a) / 2 * res
+            y_max = -logtau / 2
+            y = y_max * u[1]
+            logx1 = logtau / 2 + y
+            logx2 = logtau / 2 - y
+            for p1, p2, sigma_hat in channels:
+                res = res + (self.pdf_interpolator(p1)(logx1)
+                             * self.pdf_interpolator(p2)(logx2)
+                             * sigma_hat(tau * s, y))
+            return (b - a) / 2 * y_max * res
+
+        if method == 'gauss':
+            def gauss(m):
+                t, w = np.polynomial.legendre.leggauss(m)
+                u = np.stack(np.meshgrid(*dim * [t], indexing='ij')).reshape(dim, -1)
+                w = np.prod(np.meshgrid(*dim * [w], indexing='ij'), axis=0).ravel()
+                return np.sum(w * integrand(u))
+            value = gauss(n)
+            error = abs(value - gauss(n // 2))
+        else:
+            rng = np.random.default_rng(seed)
+            u = rng.uniform(-1, 1, size=(dim, n))
+            g = 2**dim * integrand(u)
+            value = np.mean(g)
+            error = np.std(g) / np.sqrt(n)
+        return float(value), float(error)
+
 
 # alias to mimic LHAPDF API
 mkPDF = PDF
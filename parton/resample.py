@@ -0,0 +1,154 @@
+"""Resampling of PDF grids onto reduced knot grids."""
+
+
+import glob
+import os
+import time
+import numpy as np
+from . import pdf
+
+
+def thin_knots(logknots, values, rtol, atol):
+    """Return the indices of a subset of the knots `logknots` such that the
+    cubic spline through `values` (an array with the knots along the first
+    axis) on this subset reproduces all `values` within
+    `|delta| <= rtol * |values| + atol`.
+
+    Starting from four equidistant knots, in every gap between the retained
+    knots where the tolerance is violated, the knot with the largest
+    violation is added, until the tolerance is met."""
+    import scipy.interpolate
+    m = len(logknots)
+    if m <= 4:
+        return np.arange(m)
+    keep = np.unique(np.linspace(0, m - 1, 4).round().astype(int))
+    while len(keep) < m:
+        spline = scipy.interpolate.make_interp_spline(logknots[keep], values[keep], k=3)
+        excess = np.abs(spline(logknots) - values) - (rtol * np.abs(values) + atol)
+        excess = excess.reshape(m, -1).max(axis=1)
+        bad = excess > 0
+        if not np.any(bad):
+            break
+        gaps = np.searchsorted(keep, np.arange(m))
+        new = []
+        for gap in np.unique(gaps[bad]):
+            i, = np.where(bad & (gaps == gap))
+            new.append(i[np.argmax(excess[i])])
+        keep = np.union1d(keep, new)
+    return keep
+
+
+def merge_grids(p):
+    """Return a single `PDFGrid` instance merging all subgrids of the `PDF`
+    instance `p` that share the same `x` knots and flavors.
+
+    The `Q` knots are the union of the knots of all subgrids and the values
+    are obtained by interpolating the original PDF, so discontinuities
+    between subgrids (e.g. at flavor thresholds) are smoothed out."""
+    first = p.pdfgrids[0]
+    for pdfgrid in p.pdfgrids[1:]:
+        if (not np.array_equal(pdfgrid.x, first.x)
+                or not np.array_equal(pdfgrid.flavors, first.flavors)):
+            raise ValueError("Only subgrids with identical x knots and flavors can be merged")
+    Q = np.unique(np.concatenate([pdfgrid.Q for pdfgrid in p.pdfgrids]))
+    xfgrid = np.stack([np.reshape(p.xfxQ2(f, first.x, Q**2), -1)
+                       for f in first.flavors], axis=1)
+    return pdf.PDFGrid(first.x, Q, xfgrid, first.flavors)
+
+
+def resample_grid(pdfgrid, rtol, atol):
+    """Return a new `PDFGrid` instance with a subset of the knots of
+    `pdfgrid` that reproduces the values on all original knots within
+    `|delta| <= rtol * |values| + atol`.
+
+    The x and Q directions are thinned one after the other, each with half
+    of the tolerance."""
+    m, n = len(pdfgrid.x), len(pdfgrid.Q)
+    values = pdfgrid.xfgrid.reshape(m, n, -1)
+    ix = thin_knots(pdfgrid.logx, values, rtol / 2, atol / 2)
+    iQ = thin_knots(pdfgrid.logQ2, values[ix].transpose(1, 0, 2), rtol / 2, atol / 2)
+    xfgrid = values[ix][:, iQ].reshape(len(ix) * len(iQ), -1)
+    return pdf.PDFGrid(pdfgrid.x[ix], pdfgrid.Q[iQ], xfgrid, pdfgrid.flavors)
+
+
+def resample(p, name, pdfdir=None, rtol=1e-3, atol=1e-8, merge=False,
+             n_test=10000, seed=0, overwrite=False):
+    """Resample the `PDF` instance `p` onto reduced knot grids and write the
+    result as a new PDF set with name `name` and a single member in 'lhagrid1'
+    format to the directory `pdfdir` (defaults to the directory of `p`), where
+    it can be loaded with `mkPDF(name, 0)`.
+
+    Parameters:
+
+    - `rtol`, `atol`: relative and absolute interpolation tolerance on
+      the original knots
+    - `merge`: if true, merge all subgrids into a single grid first (see
+      `merge_grids`)
+    - `n_test`: number of random points used to compare the resampled to
+      the original PDF
+    - `seed`: random seed for the test points
+    - `overwrite`: if true, the files of an existing set `name` in `pdfdir`
+      are replaced; otherwise, a `ValueError` is raised. The source set of
+      `p` itself can never be overwritten.
+
+    Returns a dictionary with the number of knots before and after
+    resampling, the maximum absolute and relative error on the test points
+    (where the relative error is `|delta| / (|xf| + atol / rtol)`, so it is
+    comparable to `rtol`), and the speedup in loading and evaluating the
+    PDF."""
+    pdfdir = pdfdir or p.pdfset.pdfdir
+    target = os.path.join(pdfdir, name)
+    if os.path.exists(target):
+        source = os.path.join(p.pdfset.pdfdir, p.pdfset.name)
+        if os.path.realpath(target) == os.path.realpath(source):
+            raise ValueError("Cannot overwrite the source PDF set {}".format(source))
+        if not overwrite:
+            raise ValueError("PDF set {} already exists".format(target))
+    grids = [merge_grids(p)] if merge else p.pdfgrids
+    new_grids = [resample_grid(pdfgrid, rtol, atol) for pdfgrid in grids]
+    info = dict(p.pdfset.info)
+    info['SetDesc'] = "{} member {} resampled with rtol={}, atol={}".format(
+        p.name, p.member, rtol, atol)
+    info['NumMembers'] = 1
+    info['Format'] = 'lhagrid1'
+    if os.path.exists(target):
+        # remove the files of the old set, which may have more members
+        pattern = os.path.join(glob.escape(target), glob.escape(name))
+        for filename in glob.glob(pattern + '.info') + glob.glob(pattern + '_[0-9]*.dat'):
+            os.remove(filename)
+    pdfset = pdf.PDFSet(name, pdfdir=pdfdir, info=info)
+    pdfset.write_metadata()
+    pdf.PDFMember(pdfset, 0).write(p.meta, new_grids)
+
+    report = {
+        'knots_before': sum(len(g.x) * len(g.Q) for g in p.pdfgrids),
+        'knots_after': sum(len(g.x) * len(g.Q) for g in new_grids),
+        'filesize_before': os.path.getsize(p.pdfmember.filename()),
+        'filesize_after': os.path.getsize(pdf.PDFMember(pdfset, 0).filename()),
+    }
+    t0 = time.perf_counter()
+    p_orig = pdf.PDF(p.name, member=p.member, pdfdir=p.pdfset.pdfdir)
+    t1 = time.perf_counter()
+    p_new = pdf.PDF(name, member=0, pdfdir=pdfdir)
+    t2 = time.perf_counter()
+    report['load_speedup'] = (t1 - t0) / (t2 - t1)
+
+    rng = np.random.default_rng(seed)
+    logx = np.concatenate([g.logx for g in p.pdfgrids])
+    logQ2 = np.concatenate([g.logQ2 for g in p.pdfgrids])
+    flavor = rng.choice(p.pdfgrids[0].flavors, n_test)
+    x = np.exp(rng.uniform(np.min(logx), np.max(logx), n_test))
+    Q2 = np.exp(rng.uniform(np.min(logQ2), np.max(logQ2), n_test))
+    # the first call builds the interpolators and is not timed
+    ref = p_orig.xfxQ2(flavor, x, Q2, grid=False)
+    res = p_new.xfxQ2(flavor, x, Q2, grid=False)
+    t0 = time.perf_counter()
+    p_orig.xfxQ2(flavor, x, Q2, grid=False)
+    t1 = time.perf_counter()
+    p_new.xfxQ2(flavor, x, Q2, grid=False)
+    t2 = time.perf_counter()
+    report['eval_speedup'] = (t1 - t0) / (t2 - t1)
+    delta = np.abs(res - ref)
+    report['max_abs_error'] = np.nanmax(delta)
+    report['max_rel_error'] = np.nanmax(delta / (np.abs(ref) + atol / rtol))
+    return report
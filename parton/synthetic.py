@@ -0,0 +1,141 @@
+"""Synthetic PDF sets with known analytic shapes for testing and benchmarking."""
+
+
+import time
+import tracemalloc
+import numpy as np
+from . import pdf
+
+
+FLAVORS = [-5, -4, -3, -2, -1, 1, 2, 3, 4, 5, 21]
+
+
+def shape(flavor):
+    """Return the tuple `(norm, a, b)` of parameters of the synthetic
+    x*f(x) = norm * x^a * (1-x)^b at Q2 = 1 GeV^2 for flavor `flavor`."""
+    if flavor in (0, 21):
+        return 2.0, -0.2, 5.0
+    if flavor in (1, 2):
+        return 0.5 * flavor, 0.4, 3.0
+    return 0.2 / abs(flavor), -0.1, 7.0
+
+
+def xfxQ2(flavor, x, Q2, member=0):
+    """Return the exact synthetic x*f(x) for flavor `flavor`, momentum
+    fraction `x`, squared factorization scale `Q2` in GeV^2, and
+    member `member`.
+
+    The small-x exponent grows logarithmically with `Q2` and varies slightly
+    with the member, so that the members and subgrids of a synthetic set are
+    all different. `flavor`, `x`, and `Q2` are broadcast against each other."""
+    flavor, x, Q2 = np.broadcast_arrays(flavor, x, Q2)
+    res = np.empty(x.shape)
+    for f in np.unique(flavor):
+        mask = flavor == f
+        norm, a, b = shape(f)
+        logQ2 = np.log(Q2[mask])
+        a = a - 0.02 * logQ2 + 0.001 * member
+        res[mask] = norm * x[mask]**a * (1 - x[mask])**b * (1 + 0.05 * logQ2)
+    return res
+
+
+def grids(member=0, subgrids=2, nx=50, nQ=20, flavors=FLAVORS,
+          x_min=1e-6, Q_min=1, Q_max=1e4):
+    """Return a list of `subgrids` `PDFGrid` instances with the synthetic
+    x*f(x) for member `member` on `nx` x knots from `x_min` to 1 and `nQ`
+    logarithmically spaced Q knots per subgrid.
+
+    Like in typical LHAPDF grids, half of the x knots are logarithmically
+    spaced below x=0.1 and half are linearly spaced above. The subgrids
+    split the range from `Q_min` to `Q_max` in GeV into equal pieces in
+    log(Q) and share their boundary knots."""
+    x = np.concatenate([np.geomspace(x_min, 0.1, nx // 2, endpoint=False),
+                        np.linspace(0.1, 1, nx - nx // 2)])
+    Q_edges = np.geomspace(Q_min, Q_max, subgrids + 1)
+    res = []
+    for Q_lo, Q_hi in zip(Q_edges[:-1], Q_edges[1:]):
+        Q = np.geomspace(Q_lo, Q_hi, nQ)
+        X, Q2 = np.meshgrid(x, Q**2, indexing='ij')
+        xfgrid = np.stack([xfxQ2(f, X, Q2, member=member).ravel() for f in flavors],
+                          axis=1)
+        res.append(pdf.PDFGrid(x, Q, xfgrid, np.array(flavors)))
+    return res
+
+
+def write_pdfset(name, pdfdir, members=1, subgrids=2, nx=50, nQ=20,
+                 flavors=FLAVORS, x_min=1e-6, Q_min=1, Q_max=1e4):
+    """Write a synthetic PDF set with name `name` to the directory `pdfdir`,
+    consisting of the `.info` file and one 'lhagrid1' data file per member.
+
+    The set has `members` members (with error type 'replicas') and the
+    remaining arguments are passed to `grids`. Returns the `PDFSet`
+    instance."""
+    info = {
+        'SetDesc': "Synthetic PDF set generated by parton",
+        'Format': 'lhagrid1',
+        'NumMembers': members,
+        'ErrorType': 'replicas',
+        'Flavors': list(flavors),
+        'XMin': float(x_min),
+        'XMax': 1.0,
+        'QMin': float(Q_min),
+        'QMax': float(Q_max),
+    }
+    pdfset = pdf.PDFSet(name, pdfdir=pdfdir, info=info)
+    pdfset.write_metadata()
+    for member in range(members):
+        meta = {'PdfType': 'central' if member == 0 else 'replica',
+                'Format': 'lhagrid1'}
+        pdfgrids = grids(member=member, subgrids=subgrids, nx=nx, nQ=nQ,
+                         flavors=flavors, x_min=x_min, Q_min=Q_min, Q_max=Q_max)
+        pdf.PDFMember(pdfset, member).write(meta, pdfgrids)
+    return pdfset
+
+
+def benchmark(pdfdir, sizes, subgrids=2, flavors=FLAVORS, n_test=10000, seed=0):
+    """Measure load time, memory, evaluation time and interpolation error
+    of synthetic PDF sets of increasing size, written to `pdfdir`.
+
+    `sizes` is a list of tuples `(nx, nQ)` of knots per subgrid. For each
+    size, a single-member set is written and the following quantities are
+    returned as a list of dictionaries:
+
+    - `load_time`: time in seconds to instantiate the `PDF`
+    - `eval_time`: time in seconds to evaluate `n_test` random points
+      with `xfxQ2(..., grid=False)`, including building the interpolators
+    - `peak_memory`: peak memory in bytes allocated by Python during
+      loading and evaluation, as measured by `tracemalloc` in a separate
+      pass that is not included in the timings
+    - `max_rel_error`: maximum relative deviation from the exact function
+      on the random points, excluding x > 0.7 where x*f(x) is tiny"""
+    rng = np.random.default_rng(seed)
+    x_min, Q_min, Q_max = 1e-6, 1, 1e4
+    flavor = rng.choice(flavors, n_test)
+    x = np.exp(rng.uniform(np.log(x_min), np.log(0.7), n_test))
+    Q2 = np.exp(rng.uniform(np.log(Q_min**2), np.log(Q_max**2), n_test))
+    exact = xfxQ2(flavor, x, Q2)
+    results = []
+    for nx, nQ in sizes:
+        name = 'synthetic_{}x{}x{}'.format(subgrids, nx, nQ)
+        write_pdfset(name, pdfdir, subgrids=subgrids, nx=nx, nQ=nQ, flavors=flavors,
+                     x_min=x_min, Q_min=Q_min, Q_max=Q_max)
+        t0 = time.perf_counter()
+        p = pdf.PDF(name, member=0, pdfdir=pdfdir)
+        t1 = time.perf_counter()
+        res = p.xfxQ2(flavor, x, Q2, grid=False)
+        t2 = time.perf_counter()
+        # tracing slows down Python considerably, so memory is measured
+        # in a separate pass with a new instance
+        tracemalloc.start()
+        pdf.PDF(name, member=0, pdfdir=pdfdir).xfxQ2(flavor, x, Q2, grid=False)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results.append({
+            'nx': nx,
+            'nQ': nQ,
+            'load_time': t1 - t0,
+            'eval_time': t2 - t1,
+            'peak_memory': peak_memory,
+            'max_rel_error': np.max(np.abs(res / exact - 1)),
+        })
+    return results
@@ -4,6 +4,7 @@ import tempfile
 import os
 import shutil
 from . import cli, io
+from .test_lhapdf import skip_if_offline
 
 
 # path of the Python interpreter
@@ -11,6 +12,10 @@ PYTHON = sys.executable
 
 
 class TestCLI(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        skip_if_offline()
+
     def test_cli(self):
         dir = tempfile.mkdtemp()
         cli.main(['--listdir', dir, 'update'])
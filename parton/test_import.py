@@ -0,0 +1,51 @@
+import unittest
+import subprocess
+import sys
+import tempfile
+import os
+import shutil
+
+
+# path of the Python interpreter
+PYTHON = sys.executable
+
+# modules that must only be imported when they are actually needed
+LAZY_MODULES = ['scipy', 'yaml', 'appdirs', 'urllib.request', 'tarfile']
+
+
+def importtime(*args):
+    """Run the Python interpreter with `-X importtime` and the arguments
+    `args` and return a dictionary mapping the names of the imported
+    modules to their cumulative import time in microseconds."""
+    proc = subprocess.run([PYTHON, '-X', 'importtime'] + list(args),
+                          capture_output=True, text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestImport(unittest.TestCase):
+    def test_import(self):
+        times = importtime('-c', 'import parton')
+        self.assertIn('parton', times)
+        for module in LAZY_MODULES:
+            self.assertNotIn(module, times)
+        # import time on top of numpy, in microseconds
+        self.assertLess(times['parton'] - times['numpy'], 500000)
+
+    def test_cli_list(self):
+        dir = tempfile.mkdtemp()
+        with open(os.path.join(dir, 'pdfsets.index'), 'w') as f:
+            f.write('10800 CT10 1\n')
+        times = importtime('-m', 'parton', '--listdir', dir, '--pdfdir', dir, 'list')
+        for module in LAZY_MODULES:
+            self.assertNotIn(module, times)
+        shutil.rmtree(dir)
+
+    def test_lazy_import(self):
+        times = importtime('-c', 'from parton import pdf; pdf.spline_class()')
+        self.assertIn('scipy.interpolate', times)
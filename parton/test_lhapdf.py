@@ -1,9 +1,27 @@
 import unittest
+import functools
 from . import pdf, io
 import shutil
 import tempfile
 
 
+@functools.lru_cache(maxsize=None)
+def online():
+    """Return True if the LHAPDF server can be reached."""
+    import urllib.request
+    try:
+        urllib.request.urlopen(io.URL_INDEX, timeout=10).close()
+    except OSError:
+        return False
+    return True
+
+
+def skip_if_offline():
+    """Skip the calling test if the LHAPDF server cannot be reached."""
+    if not online():
+        raise unittest.SkipTest("LHAPDF server not reachable")
+
+
 lhapdf_CT10 ={
  (-4, 1e-08, 10.0): 12.126009150675591,
  (-4, 1e-08, 56.23413251903491): 41.02476133438564,
@@ -241,6 +259,10 @@ lhapdf_MSTW = {
 }
 
 class TestLHAPDF(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        skip_if_offline()
+
     def test_lhapdf_ct10(self):
         dir = tempfile.mkdtemp()
         io.download_pdfset('CT10', dir)
@@ -3,33 +3,35 @@ import tempfile
 import os
 import shutil
 import numpy as np
-from . import pdf, io
-import numpy as np
+import scipy.integrate
+from . import pdf, synthetic
 
 
 class TestPDF(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         cls._dir = tempfile.mkdtemp()
-        for pdfset in ['CT10', 'NNPDF31_nnlo_as_0118', 'NNPDF30_nnlo_as_0118']:
-            io.download_pdfset(pdfset, cls._dir)
+        synthetic.write_pdfset('synthetic', cls._dir, members=11)
+        synthetic.write_pdfset('synthetic_3', cls._dir, subgrids=3, nx=40, nQ=10,
+                               Q_max=1e5)
+        synthetic.write_pdfset('synthetic_udg', cls._dir, subgrids=1, nx=100,
+                               flavors=[1, 2, 21], x_min=1e-7)
 
     @classmethod
     def tearDownClass(cls):
         shutil.rmtree(cls._dir)
 
     def test_init(self):
-        set = pdf.PDFSet('CT10', pdfdir=self._dir)
+        set = pdf.PDFSet('synthetic', pdfdir=self._dir)
         self.assertIsInstance(set.info, dict)
         member = pdf.PDFMember(set, 1)
         self.assertEqual(member.filename(),
-                         os.path.join(self._dir, 'CT10', 'CT10_0001.dat'))
+                         os.path.join(self._dir, 'synthetic', 'synthetic_0001.dat'))
         meta, grids = member.load()
         pdf.PDFGrid.from_block(grids[0])
 
     def test_interpolators(self):
-        dir = tempfile.mkdtemp()
-        for pdfset in ['CT10', 'NNPDF31_nnlo_as_0118', 'NNPDF30_nnlo_as_0118']:
+        for pdfset in ['synthetic', 'synthetic_3', 'synthetic_udg']:
             pd = pdf.PDF(pdfset, member=0, pdfdir=self._dir)
 
             for grid in pd.pdfgrids:
@@ -51,7 +53,7 @@ class TestPDF(unittest.TestCase):
                                         msg=f"Failed for {pdfset} with flavor {flavor}, x={x}, Q2={Q2} (interpolated: {grid.xfxQ2(flavor, x, Q2)}, grid: {grid_values[ix, iQ2]})")
 
     def test_broadcast(self):
-        pd = pdf.PDF('CT10', member=0, pdfdir=self._dir)
+        pd = pdf.PDF('synthetic', member=0, pdfdir=self._dir)
         x = np.geomspace(1e-5, 1e-1, 10)
         Q2 = np.geomspace(1, 1e4, 10)
         np.testing.assert_array_equal(
@@ -65,3 +67,145 @@ class TestPDF(unittest.TestCase):
             np.vectorize(pd.xfxQ2)(flavor, x, Q2),
             pd.xfxQ2(flavor, x, Q2, grid=False),
         )
+
+    def test_derivatives(self):
+        pd = pdf.PDF('synthetic', member=0, pdfdir=self._dir)
+        flavor = np.array([0, 3, 1, -2])
+        x = np.array([0.1, 0.2, 0.01, 1e-4])
+        Q2 = np.array([10, 100, 50, 2e4])
+        xf, dlogx, dlogQ2 = pd.xfxQ2_derivatives(flavor, x, Q2, grid=False)
+        np.testing.assert_allclose(xf, pd.xfxQ2(flavor, x, Q2, grid=False), rtol=1e-12)
+        h = 1e-5
+        np.testing.assert_allclose(
+            dlogx,
+            (pd.xfxQ2(flavor, x * np.exp(h), Q2, grid=False)
+             - pd.xfxQ2(flavor, x * np.exp(-h), Q2, grid=False)) / (2 * h),
+            rtol=1e-4,
+        )
+        np.testing.assert_allclose(
+            dlogQ2,
+            (pd.xfxQ2(flavor, x, Q2 * np.exp(h), grid=False)
+             - pd.xfxQ2(flavor, x, Q2 * np.exp(-h), grid=False)) / (2 * h),
+            rtol=1e-4,
+        )
+        x, Q2 = np.sort(x), np.sort(Q2)
+        xf, dlogx, dlogQ2 = pd.xfxQ2_derivatives(1, x, Q2)
+        self.assertEqual(dlogx.shape, (4, 4))
+        np.testing.assert_allclose(xf, pd.xfxQ2(1, x, Q2), rtol=1e-12)
+
+    def test_moments(self):
+        pd = pdf.PDF('synthetic', member=0, pdfdir=self._dir)
+        for f in (21, 2, -1):
+            for N in (1, 2, 3):
+                self.assertAlmostEqual(
+                    pd.moment(f, N, 100, x_min=1e-3) / scipy.integrate.quad(
+                        lambda x: x**(N - 2) * pd.xfxQ2(f, x, 100), 1e-3, 1,
+                        limit=200)[0],
+                    1, delta=1e-6, msg="Failed for {}".format((f, N)))
+        self.assertEqual(np.shape(pd.moment([1, 2], 2, [10, 100, 1000])), (2, 3))
+        Q2 = np.array([10, 1e4])
+        sr = pd.sum_rules(Q2)
+
+        def exact(f, N, Q2):
+            # integral over log(x) of the exact x^(N-1) * x*f(x)
+            return scipy.integrate.quad(
+                lambda t: np.exp((N - 1) * t) * synthetic.xfxQ2(f, np.exp(t), Q2).item(),
+                np.log(1e-6), 0, limit=200)[0]
+
+        for i, Q2 in enumerate(Q2):
+            self.assertAlmostEqual(
+                sr['momentum'][i] / sum(exact(f, 2, Q2) for f in synthetic.FLAVORS),
+                1, delta=1e-4)
+            self.assertAlmostEqual(
+                sr['uv'][i] / (exact(2, 1, Q2) - exact(-2, 1, Q2)), 1, delta=1e-4)
+
+    def test_pdfset(self):
+        pdfset = pdf.PDFSet('synthetic', pdfdir=self._dir)
+        members = [0, 3]
+        flavor = np.array([0, 3, 1])
+        x = np.array([0.1, 0.2, 0.01])
+        Q2 = np.array([10, 100, 50])
+        res_grid = pdfset.xfxQ2(1, np.sort(x), np.sort(Q2), members=members)
+        res = pdfset.xfxQ2(flavor, x, Q2, members=members, grid=False)
+        moments = pdfset.moment(flavor, 2, Q2, members=members)
+        for i, member in enumerate(members):
+            pd = pdf.PDF('synthetic', member=member, pdfdir=self._dir)
+            np.testing.assert_allclose(res_grid[i], pd.xfxQ2(1, np.sort(x), np.sort(Q2)),
+                                       rtol=1e-12)
+            np.testing.assert_allclose(res[i], pd.xfxQ2(flavor, x, Q2, grid=False), rtol=1e-12)
+            np.testing.assert_allclose(moments[i], pd.moment(flavor, 2, Q2), rtol=1e-12)
+        # non-finite and out-of-range points give NaN as for a single member
+        x = np.array([0.1, np.nan, 2.0, 1e-9])
+        res = pdfset.xfxQ2(1, x, [10, 10, 10, np.inf], members=members, grid=False)
+        self.assertEqual(res.shape, (2, 4))
+        self.assertTrue(np.all(np.isnan(res[:, 1:])))
+        pd = pdf.PDF('synthetic', member=3, pdfdir=self._dir)
+        np.testing.assert_allclose(res[1, 0], pd.xfxQ2(1, 0.1, 10), rtol=1e-12)
+        res = pdfset.xfxQ2(1, np.array([]), 10, members=members, grid=False)
+        self.assertEqual(res.shape, (2, 0))
+
+    def test_stream(self):
+        pd = pdf.PDF('synthetic', member=0, pdfdir=self._dir)
+        rng = np.random.default_rng(0)
+        n = 1000
+        flavor = rng.choice([-2, -1, 0, 1, 2], n)
+        x = np.exp(rng.uniform(np.log(1e-6), 0, n))
+        Q2 = np.exp(rng.uniform(np.log(2), np.log(1e8), n))
+        res = pd.xfxQ2(flavor, x, Q2, grid=False)
+        np.testing.assert_array_equal(
+            pd.xfxQ2_stream(flavor, x, Q2, chunksize=300), res)
+        dir = tempfile.mkdtemp()
+        filename = os.path.join(dir, 'x.npy')
+        np.save(filename, x)
+        x_mmap = np.load(filename, mmap_mode='r')
+        out = pd.xfxQ2_stream(flavor, x_mmap, Q2, chunksize=300,
+                              out=os.path.join(dir, 'out.npy'))
+        np.testing.assert_array_equal(out, res)
+        out = pd.xfxQ2_stream(flavor, x_mmap, Q2, chunksize=300, processes=2)
+        np.testing.assert_array_equal(out, res)
+        chunks = [(flavor[i:i + 300], x[i:i + 300], Q2[i:i + 300])
+                  for i in range(0, n, 300)]
+        np.testing.assert_array_equal(np.concatenate(list(pd.iter_xfxQ2(chunks))), res)
+        del x_mmap, out
+        shutil.rmtree(dir)
+
+    def test_reweight(self):
+        pdfset = pdf.PDFSet('synthetic', pdfdir=self._dir)
+        self.assertListEqual(pdfset.replicas(), list(range(1, 11)))
+        # the replicas are taken from the cached stack of all members
+        full = pdfset.grids()[0]
+        full.coefficients(21)
+        replicas = pdfset.grids(pdfset.replicas())[0]
+        self.assertTrue(np.shares_memory(replicas.xfgrids, full.xfgrids))
+        self.assertTrue(np.shares_memory(replicas.coefficients(21)[2],
+                                         full.coefficients(21)[2]))
+        loaded = pdf.PDFSet('synthetic', pdfdir=self._dir).grids(pdfset.replicas())[0]
+        np.testing.assert_array_equal(replicas.xfgrids, loaded.xfgrids)
+        np.testing.assert_array_equal(pdfset.grids([3, 1])[0].xfgrids,
+                                      loaded.xfgrids[[2, 0]])
+        members = list(range(1, 11))
+        x = np.array([0.01, 0.1, 0.3])
+        Q2 = 100
+
+        def predictions(xfxQ2):
+            return xfxQ2(2, x, Q2)[:, :, 0] + xfxQ2(1, x, Q2)[:, :, 0]
+
+        central = [pdf.PDF('synthetic', member=m, pdfdir=self._dir)
+                   for m in members]
+        theory = np.array([p.xfxQ2(2, x, Q2).ravel() + p.xfxQ2(1, x, Q2).ravel()
+                           for p in central])
+        data = np.mean(theory, axis=0)
+        err = 0.01 * data
+        rw = pdfset.reweight(predictions, data, err, members=members)
+        chi2 = np.sum(((theory - data) / err)**2, axis=1)
+        np.testing.assert_allclose(rw.chi2, chi2)
+        w = chi2 * np.exp(-chi2 / 2)
+        np.testing.assert_allclose(rw.weights, len(members) * w / np.sum(w))
+        self.assertLess(rw.n_eff, len(members))
+        rw_cov = pdfset.reweight(theory, data, np.diag(err**2), members=members)
+        np.testing.assert_allclose(rw_cov.weights, rw.weights)
+        mean, std = rw.xfxQ2(21, x, Q2)
+        values = np.array([p.xfxQ2(21, x, Q2) for p in central])
+        np.testing.assert_allclose(mean, np.average(values, axis=0, weights=w), rtol=1e-10)
+        np.testing.assert_allclose(
+            std, np.sqrt(np.average((values - mean)**2, axis=0, weights=w)), rtol=1e-10)
@@ -1,8 +1,9 @@
 import unittest
 import tempfile
 import shutil
-from . import pdf, io
+from . import pdf, synthetic
 import numpy as np
+import scipy.integrate
 import scipy.interpolate
 
 
@@ -24,8 +25,9 @@ def interpolator_slow(pl, p1, p2):
 class TestPartonLumi(unittest.TestCase):
     def test_plumi(self):
         dir = tempfile.mkdtemp()
-        for pdfset in ['CT10', 'NNPDF31_nnlo_as_0118', 'NNPDF30_nnlo_as_0118']:
-            io.download_pdfset(pdfset, dir)
+        synthetic.write_pdfset('synthetic', dir)
+        synthetic.write_pdfset('synthetic_3', dir, subgrids=3, nx=40, nQ=10, Q_max=1e5)
+        for pdfset in ['synthetic', 'synthetic_3']:
             pd = pdf.PDF(pdfset, member=0, pdfdir=dir)
             pl = pdf.PLumi(pd, Q2=1000**2)
 
@@ -37,3 +39,33 @@ class TestPartonLumi(unittest.TestCase):
                     self.assertAlmostEqual(L / L_slow, 1, delta=0.01,
                                         msg="Failed for {}".format((pdfset, f, t)))
         shutil.rmtree(dir)
+
+    def test_sigma(self):
+        dir = tempfile.mkdtemp()
+        synthetic.write_pdfset('synthetic', dir)
+        pd = pdf.PDF('synthetic', member=0, pdfdir=dir)
+        pl = pdf.PLumi(pd, Q2=100**2)
+        s = 13000**2
+        channels = [(f, -f, lambda shat: 1 / shat) for f in (1, 2)]
+        channels_y = [(f, -f, lambda shat, y: 1 / shat) for f in (1, 2)]
+        sigma_slow = sum(scipy.integrate.quad(lambda t: pl.L(p1, p2, t) / (t * s),
+                                              1e-4, 1, limit=200)[0]
+                         for p1, p2, _ in channels)
+        sigma, err = pl.sigma(channels, s, tau_min=1e-4)
+        self.assertAlmostEqual(sigma / sigma_slow, 1, delta=1e-4)
+        self.assertLess(err / sigma, 1e-4)
+        sigma, err = pl.sigma(channels_y, s, tau_min=1e-4, rapidity=True)
+        self.assertAlmostEqual(sigma / sigma_slow, 1, delta=0.01)
+        sigma, err = pl.sigma(channels, s, tau_min=1e-4, method='mc', n=10000, seed=1)
+        self.assertAlmostEqual(sigma, sigma_slow, delta=5 * err)
+        sigma, err = pl.sigma(channels, s, tau_min=1e-4, n=2)
+        self.assertTrue(np.isfinite(sigma) and np.isfinite(err))
+        for n in (0, 1):
+            with self.assertRaises(ValueError):
+                pl.sigma(channels, s, n=n)
+        with self.assertRaises(ValueError):
+            pl.sigma(channels, s, method='simpson')
+        for tau_min, tau_max in ((1e-4, 1.5), (0.5, 0.1), (0.1, 0.1), (1e-9, 1)):
+            with self.assertRaises(ValueError):
+                pl.sigma(channels, s, tau_min=tau_min, tau_max=tau_max)
+        shutil.rmtree(dir)
@@ -0,0 +1,64 @@
+import unittest
+import tempfile
+import os
+import shutil
+import numpy as np
+from . import pdf, synthetic, resample
+
+
+class TestResample(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._dir = tempfile.mkdtemp()
+        synthetic.write_pdfset('synthetic', cls._dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls._dir)
+
+    def test_to_block(self):
+        p = pdf.PDF('synthetic', member=0, pdfdir=self._dir)
+        for pdfgrid in p.pdfgrids:
+            new = pdf.PDFGrid.from_block(pdfgrid.to_block())
+            np.testing.assert_array_equal(new.x, pdfgrid.x)
+            np.testing.assert_array_equal(new.Q, pdfgrid.Q)
+            np.testing.assert_array_equal(new.flavors, pdfgrid.flavors)
+            np.testing.assert_allclose(new.xfgrid, pdfgrid.xfgrid, rtol=1e-8)
+
+    def test_resample(self):
+        p = pdf.PDF('synthetic', member=0, pdfdir=self._dir)
+        rtol, atol = 1e-3, 1e-8
+        for merge in (False, True):
+            report = resample.resample(p, 'synthetic_resampled', rtol=rtol, atol=atol,
+                                       merge=merge, n_test=1000, overwrite=merge)
+            self.assertLess(report['knots_after'], report['knots_before'])
+            p_new = pdf.PDF('synthetic_resampled', member=0, pdfdir=self._dir)
+            self.assertEqual(p_new.pdfset.info['NumMembers'], 1)
+            if merge:
+                self.assertEqual(len(p_new.pdfgrids), 1)
+                continue
+            for pdfgrid, new in zip(p.pdfgrids, p_new.pdfgrids):
+                for flavor in pdfgrid.flavors:
+                    ref = pdfgrid.xfgrid[:, pdfgrid.flav_index(flavor)].reshape(
+                        len(pdfgrid.x), len(pdfgrid.Q))
+                    res = new.xfxQ2(flavor, pdfgrid.x, pdfgrid.Q**2)
+                    np.testing.assert_array_less(np.abs(res - ref),
+                                                 rtol * np.abs(ref) + atol + 1e-8)
+
+    def test_overwrite(self):
+        synthetic.write_pdfset('synthetic_3', self._dir, members=3)
+        p = pdf.PDF('synthetic', member=0, pdfdir=self._dir)
+        with self.assertRaises(ValueError):
+            resample.resample(p, 'synthetic_3', n_test=10)
+        # the existing set is left untouched
+        self.assertEqual(pdf.PDFSet('synthetic_3', pdfdir=self._dir).info['NumMembers'], 3)
+        resample.resample(p, 'synthetic_3', n_test=10, overwrite=True)
+        self.assertEqual(pdf.PDFSet('synthetic_3', pdfdir=self._dir).info['NumMembers'], 1)
+        # no data files of the old members are left behind
+        self.assertListEqual(sorted(os.listdir(os.path.join(self._dir, 'synthetic_3'))),
+                             ['synthetic_3.info', 'synthetic_3_0000.dat'])
+        for overwrite in (False, True):
+            with self.assertRaises(ValueError):
+                resample.resample(p, 'synthetic', n_test=10, overwrite=overwrite)
+        self.assertEqual(pdf.PDF('synthetic', member=0, pdfdir=self._dir).pdfgrids[0].x.shape,
+                         p.pdfgrids[0].x.shape)
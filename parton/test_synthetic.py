@@ -0,0 +1,43 @@
+import unittest
+import tempfile
+import os
+import shutil
+import numpy as np
+from . import pdf, synthetic
+
+
+class TestSynthetic(unittest.TestCase):
+    def test_write_pdfset(self):
+        dir = tempfile.mkdtemp()
+        flavors = [-2, -1, 1, 2, 21]
+        synthetic.write_pdfset('synthetic', dir, members=3, subgrids=3, nx=60, nQ=15,
+                               flavors=flavors)
+        self.assertTrue(os.path.exists(os.path.join(dir, 'synthetic', 'synthetic.info')))
+        pdfset = pdf.PDFSet('synthetic', pdfdir=dir)
+        self.assertEqual(pdfset.info['NumMembers'], 3)
+        self.assertListEqual(pdfset.info['Flavors'], flavors)
+        x = np.geomspace(1e-6, 0.7, 10)
+        Q2 = np.geomspace(1.1, 1e8, 10)
+        for member in range(3):
+            p = pdf.PDF('synthetic', member=member, pdfdir=dir)
+            self.assertEqual(len(p.pdfgrids), 3)
+            np.testing.assert_array_equal(p.pdfgrids[0].flavors, flavors)
+            for f in flavors:
+                np.testing.assert_allclose(
+                    p.xfxQ2(f, x, Q2),
+                    synthetic.xfxQ2(f, x[:, None], Q2[None, :], member=member),
+                    rtol=1e-3)
+        shutil.rmtree(dir)
+
+    def test_benchmark(self):
+        dir = tempfile.mkdtemp()
+        results = synthetic.benchmark(dir, [(20, 8), (40, 16), (80, 32)], n_test=1000)
+        self.assertEqual(len(results), 3)
+        errors = [r['max_rel_error'] for r in results]
+        # the interpolation error decreases as the grid grows
+        self.assertTrue(all(e1 > e2 for e1, e2 in zip(errors[:-1], errors[1:])))
+        self.assertLess(errors[-1], 1e-4)
+        for r in results:
+            self.assertGreater(r['load_time'], 0)
+            self.assertGreater(r['peak_memory'], 0)
+        shutil.rmtree(dir)